@@ -0,0 +1,419 @@
+"""ps.py 多会话压测脚本。
+
+用 Streamlit 的无头 AppTest 并发驱动 N 个模拟顾问会话，模型调用走本地假后端
+（不访问 Google），按并发级别统计：各步骤重跑延迟 p50/p95/p99（扣除模型耗时）、
+会话进程峰值 RSS 及增量、模型调用排队情况。
+
+AppTest 每次 run() 都会改写进程全局的 Runtime 单例和配置，不能在同一进程里并发，
+所以每个会话跑在独立的子进程中；假后端的并发槽位和排队统计通过 Manager 在进程间共享。
+
+⚠️ 局限：N 个会话从不共享同一个 Streamlit 进程 (GIL、st.cache_resource、导入状态)。
+因此延迟只反映多核 CPU 争用，内存是多个进程之和而非单个 ps.py 服务的实际占用，
+也测不出单进程内的并发问题 (如多会话同时首次导入)。结果适合做相对比较、发现回归，
+不能直接当作单台服务器的容量。
+
+用法：
+    python loadtest.py --levels 1,2,4,8 --model-latency 0.5 --model-capacity 4
+"""
+import argparse
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ps.py")
+
+FLOW_STEPS = ["load", "api_key", "curriculum", "generate", "edit", "chat", "translate", "export"]
+
+
+# ==========================================
+# 1. 本地假模型后端
+# ==========================================
+def create_shared_state(manager, capacity):
+    """同一并发级别下所有会话进程共享的后端状态。"""
+    return {
+        "slots": manager.Semaphore(capacity),
+        "lock": manager.Lock(),
+        "stats": manager.dict(calls=0, queued=0, waiting=0, max_waiting=0),
+        "wait_times": manager.list(),
+    }
+
+
+class FakeModelBackend:
+    """模拟 Gemini：固定延迟 + 抖动，最多 capacity 个请求同时处理，其余排队。"""
+
+    def __init__(self, shared, latency=0.5, jitter=0.2):
+        self.shared = shared
+        self.latency = latency
+        self.jitter = jitter
+        # 本进程内模型调用累计耗时 (排队 + 处理)，用于从重跑延迟中扣除
+        self.model_time = 0.0
+
+    def generate(self, content):
+        slots, lock, stats = self.shared["slots"], self.shared["lock"], self.shared["stats"]
+        start = time.perf_counter()
+        with lock:
+            stats["calls"] += 1
+        # 有空闲槽位时直接处理，只有拿不到槽位的调用才算排队
+        if not slots.acquire(blocking=False):
+            with lock:
+                stats["queued"] += 1
+                stats["waiting"] += 1
+                stats["max_waiting"] = max(stats["max_waiting"], stats["waiting"])
+            slots.acquire()
+            wait = time.perf_counter() - start
+            with lock:
+                stats["waiting"] -= 1
+            self.shared["wait_times"].append(wait)
+        try:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        finally:
+            slots.release()
+        self.model_time += time.perf_counter() - start
+        return self._fake_text(content)
+
+    @staticmethod
+    def _fake_text(content):
+        prompt = content[0] if content and isinstance(content[0], str) else ""
+        if "[TRENDS_START]" in prompt:
+            return (
+                "[TRENDS_START]\n1. 生成式 AI 在商业分析中的应用 (McKinsey, 2024)\n[TRENDS_END]\n"
+                "[DRAFT_START]\n这是压测用的申请动机草稿。\n[DRAFT_END]"
+            )
+        if "【Translation Task】" in prompt:
+            return "**This is a load-test translation of the draft paragraph.**"
+        return "这是压测用的模拟输出段落。"
+
+    def install(self):
+        """把假的 google.generativeai 注册到 sys.modules，ps.py 导入时即拿到它。"""
+        backend = self
+
+        class _Response:
+            def __init__(self, text):
+                self.text = text
+
+        class GenerativeModel:
+            def __init__(self, model_name, *args, **kwargs):
+                self.model_name = model_name
+
+            def generate_content(self, content, *args, **kwargs):
+                return _Response(backend.generate(content))
+
+        fake = types.ModuleType("google.generativeai")
+        fake.configure = lambda *args, **kwargs: None
+        fake.GenerativeModel = GenerativeModel
+
+        # streamlit 依赖真实的 google.protobuf，所以只在没有 google 包时才造一个父模块
+        try:
+            import google
+        except ImportError:
+            google = types.ModuleType("google")
+            google.__path__ = []
+            sys.modules["google"] = google
+        google.generativeai = fake
+        sys.modules["google.generativeai"] = fake
+
+
+# ==========================================
+# 2. 素材 Fixture (替代 file_uploader)
+# ==========================================
+class FixtureUpload(io.BytesIO):
+    """模仿 Streamlit UploadedFile：带 name / type，可被 docx、PyPDF2、PIL 直接读取。"""
+
+    def __init__(self, data, name, mime_type):
+        super().__init__(data)
+        self.name = name
+        self.type = mime_type
+
+
+def build_fixtures(material_path=None, transcript_path=None):
+    if material_path:
+        with open(material_path, "rb") as f:
+            material = (f.read(), os.path.basename(material_path))
+    else:
+        import docx
+        doc = docx.Document()
+        doc.add_paragraph("姓名：压测学生")
+        doc.add_paragraph("实习：某咨询公司数据分析实习生，负责搭建销售预测模型。")
+        doc.add_paragraph("本科：统计学，核心课程包括回归分析、机器学习、运筹学。")
+        buf = io.BytesIO()
+        doc.save(buf)
+        material = (buf.getvalue(), "material.docx")
+
+    if transcript_path:
+        with open(transcript_path, "rb") as f:
+            data = f.read()
+        name = os.path.basename(transcript_path)
+        mime = "application/pdf" if name.endswith(".pdf") else "image/png"
+        transcript = (data, name, mime)
+    else:
+        from PIL import Image
+        buf = io.BytesIO()
+        Image.new("RGB", (200, 100), "white").save(buf, format="PNG")
+        transcript = (buf.getvalue(), "transcript.png", "image/png")
+
+    material_mime = (
+        "application/pdf" if material[1].endswith(".pdf")
+        else "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
+
+    def fake_file_uploader(label, *args, **kwargs):
+        # AppTest 不支持操作 file_uploader，这里按 label 直接返回 fixture
+        if kwargs.get("accept_multiple_files"):
+            return []
+        if "文书素材" in label:
+            return FixtureUpload(material[0], material[1], material_mime)
+        if "成绩单" in label:
+            return FixtureUpload(*transcript)
+        return None
+
+    return fake_file_uploader
+
+
+# ==========================================
+# 3. 单个模拟会话 (独立子进程)
+# ==========================================
+def _by_label(widgets, prefix):
+    for w in widgets:
+        if w.label.startswith(prefix):
+            return w
+    raise LookupError(f"找不到控件: {prefix}")
+
+
+def run_session(shared, barrier, options):
+    latencies = {step: [] for step in FLOW_STEPS}
+    net_latencies = {step: [] for step in FLOW_STEPS}
+    result = {
+        "latencies": latencies,
+        "net_latencies": net_latencies,
+        "error": None,
+        "started": None,
+        "finished": None,
+        "peak_rss_mb": 0.0,
+        "rss_delta_mb": 0.0,
+    }
+
+    try:
+        import streamlit as st
+        from streamlit.testing.v1 import AppTest
+
+        backend = FakeModelBackend(shared, options["model_latency"], options["model_jitter"])
+        backend.install()
+        st.file_uploader = build_fixtures(options["material"], options["transcript"])
+    except Exception as e:
+        # 让其他会话立刻从 barrier 退出，而不是一直等下去
+        barrier.abort()
+        result["error"] = f"setup: {type(e).__name__}: {e}"
+        return result
+
+    def timed(step, action):
+        model_before = backend.model_time
+        start = time.perf_counter()
+        at = action()
+        elapsed = time.perf_counter() - start
+        latencies[step].append(elapsed)
+        net_latencies[step].append(max(0.0, elapsed - (backend.model_time - model_before)))
+        if at.exception:
+            raise RuntimeError(f"{step}: {at.exception[0].message}")
+        return at
+
+    # 等所有会话进程都完成导入后再同时开跑
+    try:
+        barrier.wait(options["startup_timeout"])
+    except Exception as e:
+        result["error"] = f"startup: 其他会话未能就绪 ({type(e).__name__})"
+        return result
+    sampler = RssSampler()
+    sampler.start()
+    result["started"] = time.time()
+    try:
+        at = AppTest.from_file(APP_SCRIPT, default_timeout=options["timeout"])
+        timed("load", at.run)
+        timed("api_key", _by_label(at.text_input, "🔑").input("fake-load-test-key").run)
+        timed("curriculum", _by_label(at.text_area, "粘贴课程列表").input("Core Modules: Machine Learning, Optimisation").run)
+        timed("generate", _by_label(at.button, "开始生成初稿").click().run)
+        timed("edit", at.text_area(key="text_Motivation").input("顾问手动修改后的申请动机草稿。").run)
+        at.text_input(key="chat_in_Motivation").input("有没有更好的表达？")
+        timed("chat", _by_label(at.button, "发送").click().run)
+        timed("translate", at.button(key="trans_btn_Motivation").click().run)
+        # 导出内容在每次重跑时生成，这里再跑一次并确认下载按钮存在
+        timed("export", at.run)
+        if not at.get("download_button"):
+            raise RuntimeError("export: 未渲染下载按钮")
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["finished"] = time.time()
+    result["peak_rss_mb"] = sampler.stop()
+    result["rss_delta_mb"] = result["peak_rss_mb"] - sampler.baseline
+    return result
+
+
+# ==========================================
+# 4. 指标采集与汇总
+# ==========================================
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # 非 Linux 回退到进程历史峰值 (macOS 单位为字节)；Windows 无 resource 模块则不统计
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class RssSampler(threading.Thread):
+    """采样本进程 RSS 峰值；报告时减去开跑前的基线，只统计会话本身带来的增量。"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.baseline = current_rss_mb()
+        self.peak = self.baseline
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, current_rss_mb())
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return max(self.peak, current_rss_mb())
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def _percentiles(values):
+    return {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+
+
+def run_level(concurrency, options):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        shared = create_shared_state(manager, options["model_capacity"])
+        barrier = manager.Barrier(concurrency)
+        with ProcessPoolExecutor(max_workers=concurrency, mp_context=ctx) as pool:
+            futures = [pool.submit(run_session, shared, barrier, options) for _ in range(concurrency)]
+            sessions = [f.result() for f in futures]
+        stats = dict(shared["stats"])
+        wait_times = list(shared["wait_times"])
+
+    per_step = {}
+    all_net = []
+    for step in FLOW_STEPS:
+        total = [v for s in sessions for v in s["latencies"][step]]
+        net = [v for s in sessions for v in s["net_latencies"][step]]
+        all_net.extend(net)
+        per_step[step] = {"total": _percentiles(total), "net": _percentiles(net)}
+
+    ran = [s for s in sessions if s["started"] is not None]
+    return {
+        "concurrency": concurrency,
+        "wall_s": max((s["finished"] for s in ran), default=0.0) - min((s["started"] for s in ran), default=0.0),
+        "reruns": len(all_net),
+        "errors": [s["error"] for s in sessions if s["error"]],
+        "rerun_net_s": _percentiles(all_net),
+        "per_step_s": per_step,
+        "peak_rss_mb_total": sum(s["peak_rss_mb"] for s in sessions),
+        "peak_rss_mb_max": max(s["peak_rss_mb"] for s in sessions),
+        "rss_delta_mb_total": sum(s["rss_delta_mb"] for s in sessions),
+        "rss_delta_mb_max": max(s["rss_delta_mb"] for s in sessions),
+        "model_calls": stats["calls"],
+        "model_queued_calls": stats["queued"],
+        "model_max_queue": stats["max_waiting"],
+        "model_wait_s": _percentiles(wait_times),
+    }
+
+
+def print_report(results):
+    header = (
+        f"{'N':>4} {'reruns':>7} {'net50':>7} {'net95':>7} {'net99':>7} "
+        f"{'peakMax':>8} {'peakSum':>8} {'dRSS':>7} "
+        f"{'calls':>6} {'queued':>7} {'maxQ':>5} {'wait95':>7} {'errors':>7}"
+    )
+    print("⚠️ 每个会话独立进程：延迟只反映 CPU 争用，内存为多进程之和，不等于单个 ps.py 服务的容量")
+    print("重跑延迟 (秒，已扣除模型排队与处理耗时)；peakMax = 单个会话进程峰值 RSS，")
+    print("peakSum = 各会话进程峰值 RSS 之和，dRSS = 各会话 RSS 增量之和 (MB)")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        net = r["rerun_net_s"]
+        print(
+            f"{r['concurrency']:>4} {r['reruns']:>7} {net['p50']:>7.3f} {net['p95']:>7.3f} {net['p99']:>7.3f} "
+            f"{r['peak_rss_mb_max']:>8.1f} {r['peak_rss_mb_total']:>8.1f} {r['rss_delta_mb_total']:>7.1f} "
+            f"{r['model_calls']:>6} {r['model_queued_calls']:>7} "
+            f"{r['model_max_queue']:>5} {r['model_wait_s']['p95']:>7.3f} {len(r['errors']):>7}"
+        )
+
+    for r in results:
+        print(f"\n[N={r['concurrency']}] 分步骤延迟 (秒)")
+        print(f"{'step':>10} {'total50':>8} {'total95':>8} {'total99':>8} {'net50':>7} {'net95':>7} {'net99':>7}")
+        for step, v in r["per_step_s"].items():
+            t, n = v["total"], v["net"]
+            print(
+                f"{step:>10} {t['p50']:>8.3f} {t['p95']:>8.3f} {t['p99']:>8.3f} "
+                f"{n['p50']:>7.3f} {n['p95']:>7.3f} {n['p99']:>7.3f}"
+            )
+        for err in sorted(set(r["errors"])):
+            print(f"[N={r['concurrency']}] {err}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ps.py 多会话压测")
+    parser.add_argument("--levels", default="1,2,4,8", help="并发会话数列表，逗号分隔")
+    parser.add_argument("--model-latency", type=float, default=0.5, help="假模型单次调用耗时 (秒)")
+    parser.add_argument("--model-jitter", type=float, default=0.2, help="假模型耗时抖动 (秒)")
+    parser.add_argument("--model-capacity", type=int, default=4, help="假模型最大并发处理数")
+    parser.add_argument("--timeout", type=float, default=120, help="单次重跑超时 (秒)")
+    parser.add_argument("--startup-timeout", type=float, default=120, help="等待所有会话进程就绪的超时 (秒)")
+    parser.add_argument("--material", help="自定义素材文件 (docx/pdf)")
+    parser.add_argument("--transcript", help="自定义成绩单文件 (png/jpg/pdf)")
+    parser.add_argument("--json", help="结果另存为 JSON")
+    args = parser.parse_args(argv)
+    for path in (args.material, args.transcript):
+        if path and not os.path.isfile(path):
+            parser.error(f"文件不存在: {path}")
+
+    options = {
+        "model_latency": args.model_latency,
+        "model_jitter": args.model_jitter,
+        "model_capacity": args.model_capacity,
+        "timeout": args.timeout,
+        "startup_timeout": args.startup_timeout,
+        "material": args.material,
+        "transcript": args.transcript,
+    }
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    results = [run_level(n, options) for n in levels]
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,23 @@
 import streamlit as st
-import google.generativeai as genai
-from PIL import Image
-import docx
-import PyPDF2
-import io
+import importlib
 import os
+import threading
 import time
 import random
 from datetime import datetime
 
+# 启动耗时测量模式：PS_PROFILE_STARTUP=1 streamlit run ps.py
+PROFILE_STARTUP = os.environ.get("PS_PROFILE_STARTUP") == "1"
+_run_started = time.perf_counter()
+_last_mark = _run_started
+_render_timings = {}
+
 # ==========================================
 # 0. 自动版本号生成逻辑
 # ==========================================
+@st.cache_resource(show_spinner=False)
 def get_app_version():
+    # 每个进程只读取一次文件时间
     try:
         timestamp = os.path.getmtime(__file__)
         dt = datetime.fromtimestamp(timestamp)
@@ -22,6 +27,33 @@ def get_app_version():
     except Exception:
         return "v13.22.Dev", "Unknown"
 
+@st.cache_resource(show_spinner=False)
+def get_startup_report():
+    # 进程级记录：重型依赖的首次导入耗时 + 首次渲染各组件耗时 (多会话共享，写入需加锁)
+    return {"lock": threading.Lock(), "imports": {}, "first_render": {}}
+
+def lazy_import(module_name):
+    # 重型依赖 (genai / PyPDF2 / docx / PIL) 在首次用到时才导入
+    # 不能用 sys.modules 抄近路：模块在加载完成前就已登记，并发会话会拿到半初始化的模块；
+    # import_module 会等待正在进行的导入完成
+    report = get_startup_report()
+    with report["lock"]:
+        if module_name not in report["imports"]:
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            cost = time.perf_counter() - start
+            report["imports"][module_name] = cost
+            if PROFILE_STARTUP:
+                print(f"[startup] import {module_name}: {cost * 1000:.1f} ms")
+            return module
+    return importlib.import_module(module_name)
+
+def mark_rendered(component):
+    global _last_mark
+    now = time.perf_counter()
+    _render_timings[component] = now - _last_mark
+    _last_mark = now
+
 current_version, last_updated_time = get_app_version()
 
 # ==========================================
@@ -30,7 +62,7 @@ current_version, last_updated_time = get_app_version()
 st.set_page_config(page_title=f"留学文书工具 {current_version}", layout="wide")
 
 # --- CSS Hack: 强制三列卡片严格等高 ---
-st.markdown("""
+GLOBAL_CSS = """
 <style>
     /* 1. 让最外层的水平容器拉伸子元素 */
     div[data-testid="stHorizontalBlock"] {
@@ -66,9 +98,13 @@ st.markdown("""
         margin-bottom: 0px;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(GLOBAL_CSS, unsafe_allow_html=True)
+mark_rendered("页面配置 & CSS")
 
 # 初始化 Session State
+is_session_first_run = 'generated_sections' not in st.session_state
 if 'generated_sections' not in st.session_state:
     st.session_state['generated_sections'] = {}
 if 'motivation_trends' not in st.session_state:
@@ -80,6 +116,7 @@ if 'chat_histories' not in st.session_state:
 
 st.title(f"留学文书辅助写作工具 {current_version}")
 st.markdown("---")
+mark_rendered("标题 & Session State")
 
 # ==========================================
 # 2. 核心文案库
@@ -168,12 +205,14 @@ with st.sidebar:
     st.info(f"**当前版本:** {current_version}")
     st.caption(f"**最后更新:** {last_updated_time}")
     st.caption("**Update:** 修复 State 冲突报错")
+mark_rendered("侧边栏")
 
 # ==========================================
 # 4. 核心函数
 # ==========================================
 def read_word_file(file):
     try:
+        docx = lazy_import("docx")
         doc = docx.Document(file)
         full_text = []
         for para in doc.paragraphs:
@@ -184,6 +223,7 @@ def read_word_file(file):
 
 def read_pdf_text(file):
     try:
+        PyPDF2 = lazy_import("PyPDF2")
         pdf_reader = PyPDF2.PdfReader(file)
         text = ""
         for page in pdf_reader.pages:
@@ -196,6 +236,7 @@ def get_gemini_response(prompt, media_content=None, text_context=None):
     if not api_key:
         return "Error: 请先在左侧侧边栏输入 API Key"
         
+    genai = lazy_import("google.generativeai")
     genai.configure(api_key=api_key)
     model = genai.GenerativeModel(model_name)
     
@@ -270,6 +311,7 @@ if uploaded_material:
         student_background_text = read_word_file(uploaded_material)
     elif uploaded_material.name.endswith('.pdf'):
         student_background_text = read_pdf_text(uploaded_material)
+mark_rendered("1. 信息采集")
 
 # ==========================================
 # 6. 界面：写作设定 (拼写偏好)
@@ -296,6 +338,7 @@ with col_style:
         ["🇬🇧 英式 (British)", "🇺🇸 美式 (American)"],
         help="翻译时将严格遵循所选的拼写习惯 (如 colour vs color)"
     )
+mark_rendered("2. 写作设定")
 
 # ==========================================
 # 7. 核心逻辑：生成 Prompt
@@ -356,6 +399,7 @@ if st.button("开始生成初稿", type="primary"):
         st.stop()
     
     # 准备媒体
+    Image = lazy_import("PIL.Image")
     transcript_content = []
     if uploaded_transcript.type == "application/pdf":
         transcript_content.append({
@@ -497,6 +541,7 @@ if st.button("开始生成初稿", type="primary"):
         progress_bar.progress(current_step / total_steps)
 
     st.success("初稿生成完毕！")
+mark_rendered("3. 一键创作")
 
 # ==========================================
 # 8. 界面：反馈、修改与翻译 (交互升级 + 灵感助手)
@@ -662,6 +707,7 @@ if st.session_state.get('generated_sections'):
                             for msg in st.session_state['chat_histories'][module]:
                                 with st.chat_message(msg["role"]):
                                     st.markdown(msg["content"])
+    mark_rendered("4. 审阅 & 翻译")
 
     # ==========================================
     # 9. 导出
@@ -686,3 +732,37 @@ if st.session_state.get('generated_sections'):
         mime="text/plain",
         type="primary"
     )
+    mark_rendered("5. 导出")
+
+# ==========================================
+# 10. 启动耗时报告 (PS_PROFILE_STARTUP=1)
+# ==========================================
+if PROFILE_STARTUP:
+    startup_report = get_startup_report()
+    is_first_render = False
+    with startup_report["lock"]:
+        # 只取冷启动后首个会话的初始渲染，避免把热重跑当作首次渲染
+        if is_session_first_run and not startup_report["first_render"]:
+            startup_report["first_render"] = dict(_render_timings)
+            is_first_render = True
+    if is_first_render:
+        for component, cost in _render_timings.items():
+            print(f"[startup] first render {component}: {cost * 1000:.1f} ms")
+        print(f"[startup] first render total: {(_last_mark - _run_started) * 1000:.1f} ms")
+
+    with st.sidebar:
+        with st.expander("⏱️ 启动耗时", expanded=False):
+            st.markdown("**重型依赖导入**")
+            if startup_report["imports"]:
+                for name, cost in startup_report["imports"].items():
+                    st.caption(f"{name}: {cost * 1000:.1f} ms")
+            else:
+                st.caption("尚未加载 (首次使用对应功能时导入)")
+            st.markdown("**首次渲染 (冷启动后首个会话)**")
+            if not startup_report["first_render"]:
+                st.caption("尚未记录 (还没有会话完成初始渲染)")
+            for component, cost in startup_report["first_render"].items():
+                st.caption(f"{component}: {cost * 1000:.1f} ms")
+            st.markdown("**本次重跑**")
+            for component, cost in _render_timings.items():
+                st.caption(f"{component}: {cost * 1000:.1f} ms")